@@ -1,416 +1,286 @@
 import os
+import re
+import compileall
+import mmap
+import stat
 import shutil
 import sys
 import importlib
 import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-# Set up logging
+# Set up logging, to a file only when FIX_PERMISSIONS_LOGFILE names one
+# (file output is buffered and flushed on errors or exit)
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+log_handlers = [logging.StreamHandler()]
+if os.getenv('FIX_PERMISSIONS_LOGFILE'):
+    # The MemoryHandler only buffers, the FileHandler does the formatting
+    file_handler = logging.FileHandler(os.environ['FIX_PERMISSIONS_LOGFILE'])
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_handlers.append(
+        logging.handlers.MemoryHandler(
+            capacity=1024,
+            flushLevel=logging.ERROR,
+            target=file_handler
+        )
+    )
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("fix_permissions.log"),
-        logging.StreamHandler()
-    ]
+    format=LOG_FORMAT,
+    handlers=log_handlers
 )
 logger = logging.getLogger("fix_permissions")
 
+# The cogs directory lives next to this script
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_COGS_DIR = os.path.join(_HERE, 'cogs')
+# Source of the cog files written by this script
+_TEMPLATES_DIR = os.path.join(_HERE, 'templates')
+
+# The per-file work below is I/O bound, so threads overlap the syscalls
+_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Patterns used to check the structure of cog files (matched against raw bytes)
+_HAS_COG_RE = re.compile(rb'\bcommands\.Cog\b')
+_HAS_SETUP_RE = re.compile(rb'^\s*async\s+def\s+setup\b', re.M)
+_COG_CLASS_RE = re.compile(rb'^class\s+(\w+)\s*\([^)]*\bcommands\.Cog\b', re.M)
+
 def ensure_cogs_directory():
     """Make sure the cogs directory exists and is accessible"""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+    cogs_dir = _COGS_DIR
     
-    # Check if cogs directory exists
-    cogs_dir = os.path.join(current_dir, 'cogs')
-    if not os.path.exists(cogs_dir):
-        logger.info(f"Creating cogs directory at: {cogs_dir}")
+    # Create the cogs directory, an existing directory is fine
+    try:
         os.makedirs(cogs_dir, exist_ok=True)
-        
-    # Make sure it's a directory
-    if not os.path.isdir(cogs_dir):
-        logger.error(f"Cogs path exists but is not a directory: {cogs_dir}")
+    except FileExistsError:
+        # The path exists but is not a directory
+        logger.error("Cogs path exists but is not a directory: %s", cogs_dir)
         # Rename the file and create directory
         backup_path = cogs_dir + '.bak'
-        logger.info(f"Renaming to {backup_path} and creating directory")
+        logger.info("Renaming to %s and creating directory", backup_path)
         os.rename(cogs_dir, backup_path)
         os.makedirs(cogs_dir, exist_ok=True)
     
     return cogs_dir
 
+def _chmod_if_needed(path, mode, dir_fd=None):
+    """Change the mode of a path unless it already matches, return True if changed
+    
+    Only regular files and directories are touched, symlinks are never followed.
+    """
+    st = os.stat(path, dir_fd=dir_fd, follow_symlinks=False)
+    if not (stat.S_ISREG(st.st_mode) or stat.S_ISDIR(st.st_mode)):
+        return False
+    if stat.S_IMODE(st.st_mode) == mode:
+        return False
+    os.chmod(path, mode, dir_fd=dir_fd)
+    return True
+
+def _fix_entry(name, mode, dir_fd, root):
+    """Fix the mode of one entry of root, report a failure and carry on with the rest
+    
+    Runs on the thread pool in fix_permissions and must not raise, see there.
+    """
+    try:
+        return _chmod_if_needed(name, mode, dir_fd=dir_fd)
+    except OSError as e:
+        logger.error("Failed to change permissions of %s: %s", os.path.join(root, name), e)
+        return False
+
+def _log_walk_error(error):
+    """Report a directory the walk could not list instead of skipping it silently"""
+    logger.error("Error listing directory: %s", error)
+
 def fix_permissions(directory):
     """Fix permissions on directory and contents"""
-    logger.info(f"Fixing permissions for: {directory}")
+    logger.info("Fixing permissions for: %s", directory)
+    
+    # Symlinks are only skipped below the root, a symlinked cogs directory
+    # is still walked through its target
+    directory = os.path.realpath(directory)
+    
+    # _chmod_if_needed skips anything but files and directories, so make sure
+    # the summary below never reports on a root that was not checked at all
+    if not os.path.isdir(directory):
+        logger.warning("Not a directory, no permissions checked: %s", directory)
+        return
+    
+    n_files = 0
+    n_dirs = 0
+    # Checked once so the per-entry messages are not built when DEBUG is off
+    debug = logger.isEnabledFor(logging.DEBUG)
     
     # Make directory executable and writable
     try:
-        os.chmod(directory, 0o755)  # rwxr-xr-x
-        logger.info(f"Changed directory permissions: {directory}")
+        if _chmod_if_needed(directory, 0o755):  # rwxr-xr-x
+            n_dirs += 1
+            if debug:
+                logger.debug("Changed directory permissions: %s", directory)
     except Exception as e:
-        logger.error(f"Failed to change directory permissions: {e}")
+        logger.error("Failed to change directory permissions: %s", e)
     
-    # Fix file permissions
+    # Fix permissions of everything below it, relative to each directory's fd
     try:
-        for item in os.listdir(directory):
-            item_path = os.path.join(directory, item)
-            if os.path.isfile(item_path):
-                os.chmod(item_path, 0o644)  # rw-r--r--
-                logger.info(f"Changed file permissions: {item_path}")
-            elif os.path.isdir(item_path):
-                fix_permissions(item_path)  # Recursive for subdirectories
-    except Exception as e:
-        logger.error(f"Error listing directory: {e}")
+        with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+            for root, dirs, files, rootfd in os.fwalk(directory, onerror=_log_walk_error):
+                # rootfd is closed once fwalk moves on, so every chmod using it
+                # must be finished first. _fix_entry never raises, so map cannot
+                # leave the loop while workers still hold the fd.
+                dir_results = list(executor.map(partial(_fix_entry, mode=0o755, dir_fd=rootfd, root=root), dirs))
+                file_results = list(executor.map(partial(_fix_entry, mode=0o644, dir_fd=rootfd, root=root), files))
+                for name, changed in zip(dirs, dir_results):
+                    if changed:
+                        n_dirs += 1
+                        if debug:
+                            logger.debug("Changed directory permissions: %s", os.path.join(root, name))
+                for name, changed in zip(files, file_results):
+                    if changed:
+                        n_files += 1
+                        if debug:
+                            logger.debug("Changed file permissions: %s", os.path.join(root, name))
+    except OSError as e:
+        # Entry failures are handled above, only listing the tree ends up here
+        logger.error("Error listing directory: %s", e)
+    
+    logger.info("Fixed %d files / %d dirs under %s", n_files, n_dirs, directory)
+
+def ensure_python_files(directory, entries):
+    """Ensure Python files have a .py extension and check for __init__.py
+    
+    Returns True if any file was renamed, which makes entries stale.
+    """
+    logger.info("Checking Python files in: %s", directory)
+    
+    # Everything below is opened relative to the directory's fd
+    dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        # Check for __init__.py
+        try:
+            fd = os.open('__init__.py', os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644, dir_fd=dir_fd)
+        except FileExistsError:
+            pass
+        else:
+            try:
+                os.write(fd, b"# This file makes the directory a Python package\n")
+            finally:
+                os.close(fd)
+            logger.info("Created __init__.py in %s", directory)
+        
+        # Check file extensions
+        renamed = False
+        opener = partial(os.open, dir_fd=dir_fd)
+        for entry in entries:
+            item = entry.name
+            item_path = entry.path
+            if entry.is_file(follow_symlinks=False) and not item.startswith('__'):
+                # Check if it looks like Python but doesn't have .py extension
+                if not item.endswith('.py'):
+                    with open(item, 'rb', opener=opener) as f:
+                        try:
+                            head = f.read(512)  # Read first 512 bytes, no decoding needed
+                            if b'import' in head and (b'def' in head or b'class' in head):
+                                # Looks like Python, rename it
+                                logger.info("Renaming %s to %s", item_path, item_path + '.py')
+                                os.rename(item, item + '.py', src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+                                renamed = True
+                        except Exception as e:
+                            logger.error("Error reading file %s: %s", item_path, e)
+    finally:
+        os.close(dir_fd)
+    
+    return renamed
 
-def ensure_python_files(directory):
-    """Ensure Python files have a .py extension and check for __init__.py"""
-    logger.info(f"Checking Python files in: {directory}")
+def _scan_cog_source(f):
+    """Return (has_cog_class, has_setup_func, cog_name) for an open cog file
     
-    # Check for __init__.py
-    init_file = os.path.join(directory, '__init__.py')
-    if not os.path.exists(init_file):
-        logger.info(f"Creating __init__.py in {directory}")
-        with open(init_file, 'w') as f:
-            f.write("# This file makes the directory a Python package\n")
+    The file is memory mapped so the patterns scan it without reading or decoding it.
+    """
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files cannot be mapped, and there is nothing in them to find
+        return False, False, None
+    
+    with mm:
+        has_cog_class = _HAS_COG_RE.search(mm) is not None
+        has_setup_func = _HAS_SETUP_RE.search(mm) is not None
+        cog_name = None
+        if has_cog_class and not has_setup_func:
+            m = _COG_CLASS_RE.search(mm)
+            cog_name = m.group(1).decode() if m else None
     
-    # Check file extensions
-    for item in os.listdir(directory):
-        item_path = os.path.join(directory, item)
-        if os.path.isfile(item_path) and not item.startswith('__'):
-            # Check if it looks like Python but doesn't have .py extension
-            if not item.endswith('.py'):
-                with open(item_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    try:
-                        content = f.read(500)  # Read first 500 chars
-                        if 'import' in content and ('def' in content or 'class' in content):
-                            # Looks like Python, rename it
-                            new_path = item_path + '.py'
-                            logger.info(f"Renaming {item_path} to {new_path}")
-                            os.rename(item_path, new_path)
-                    except Exception as e:
-                        logger.error(f"Error reading file {item_path}: {e}")
+    return has_cog_class, has_setup_func, cog_name
 
-def verify_cog_files(directory):
+def _verify_one(entry):
+    """Check a single cog file and append a setup function if it is missing"""
+    item = entry.name
+    item_path = entry.path
+    try:
+        # A single open serves both the check and the append
+        with open(item_path, 'r+b') as f:
+            # Check for basic requirements
+            has_cog_class, has_setup_func, cog_name = _scan_cog_source(f)
+            
+            if not has_cog_class:
+                logger.warning("File %s missing Cog class definition", item)
+            
+            if not has_setup_func:
+                logger.warning("File %s missing setup function", item)
+                # Add setup function if missing
+                if cog_name:
+                    f.seek(0, os.SEEK_END)
+                    f.write(f"\n\nasync def setup(bot):\n    await bot.add_cog({cog_name}(bot))\n".encode())
+                    logger.info("Added setup function to %s", item)
+    except Exception as e:
+        logger.error("Error processing file %s: %s", item_path, e)
+
+def verify_cog_files(directory, entries):
     """Verify that cog files have proper structure"""
-    logger.info(f"Verifying cog files in: {directory}")
+    logger.info("Verifying cog files in: %s", directory)
     
-    for item in os.listdir(directory):
-        if item.endswith('.py') and not item.startswith('__'):
-            item_path = os.path.join(directory, item)
-            try:
-                with open(item_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Check for basic requirements
-                has_cog_class = 'commands.Cog' in content
-                has_setup_func = 'async def setup' in content
-                
-                if not has_cog_class:
-                    logger.warning(f"File {item} missing Cog class definition")
-                
-                if not has_setup_func:
-                    logger.warning(f"File {item} missing setup function")
-                    # Add setup function if missing
-                    if has_cog_class:
-                        cog_name = None
-                        for line in content.split('\n'):
-                            if 'class' in line and '(commands.Cog)' in line:
-                                cog_name = line.split('class')[1].split('(')[0].strip()
-                                break
-                        
-                        if cog_name:
-                            with open(item_path, 'a') as f:
-                                f.write(f"\n\nasync def setup(bot):\n    await bot.add_cog({cog_name}(bot))\n")
-                            logger.info(f"Added setup function to {item}")
-            except Exception as e:
-                logger.error(f"Error processing file {item_path}: {e}")
+    cog_entries = [e for e in entries
+                   if e.name.endswith('.py') and not e.name.startswith('__')
+                   and e.is_file(follow_symlinks=False)]
+    
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+        list(executor.map(_verify_one, cog_entries))
+
+def _has_any_cog(entries):
+    """Return True as soon as one entry looks like a cog file"""
+    return any(e.name.endswith('.py') and not e.name.startswith('__')
+               and e.is_file(follow_symlinks=False) for e in entries)
 
-def create_sample_cog(directory):
+def create_sample_cog(directory, entries):
     """Create a sample cog file if no cogs exist"""
-    cog_files = [f for f in os.listdir(directory) if f.endswith('.py') and not f.startswith('__')]
-    
-    if not cog_files:
+    if not _has_any_cog(entries):
         logger.info("No cog files found. Creating a sample cog.")
         sample_cog_path = os.path.join(directory, 'example_commands.py')
         
-        sample_cog = """import discord
-from discord.ext import commands
-import logging
-
-logger = logging.getLogger("shop_bot.example_commands")
-
-class ExampleCommands(commands.Cog):
-    def __init__(self, bot):
-        self.bot = bot
-        self.db_path = "shop_database.db"
-        
-    @commands.command(name="hello")
-    async def hello(self, ctx):
-        """A simple hello command"""
-        await ctx.send("Hello! I'm working properly now!")
-        
-    @commands.command(name="echo")
-    async def echo(self, ctx, *, message):
-        """Repeats what you say"""
-        await ctx.send(f"You said: {message}")
-
-async def setup(bot):
-    await bot.add_cog(ExampleCommands(bot))
-"""
-        
-        with open(sample_cog_path, 'w') as f:
-            f.write(sample_cog)
-        logger.info(f"Created sample cog at {sample_cog_path}")
+        shutil.copyfile(os.path.join(_TEMPLATES_DIR, 'example_commands.py.tmpl'), sample_cog_path)
+        logger.info("Created sample cog at %s", sample_cog_path)
 
 def copy_existing_cogs():
     """Copy existing cogs from files we know exist"""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    cogs_dir = os.path.join(current_dir, 'cogs')
+    cogs_dir = _COGS_DIR
     
-    # Define cog content from the provided info
+    # Define cog paths, their content comes from the templates directory
     user_commands_path = os.path.join(cogs_dir, 'user_commands.py')
     admin_commands_path = os.path.join(cogs_dir, 'admin_commands.py')
     
     if not os.path.exists(user_commands_path):
         logger.info("Copying user_commands.py from provided data")
-        # Check if the user_commands.py is accessible from the additional_data
-        with open(user_commands_path, 'w') as f:
-            f.write("""import discord
-from discord.ext import commands
-import aiosqlite
-from datetime import datetime
-import logging
-import os
-import random
-import string
-
-logger = logging.getLogger("shop_bot.user_commands")
-
-class UserCommands(commands.Cog):
-    def __init__(self, bot):
-        self.bot = bot
-        self.db_path = "shop_database.db"
-        self.ltc_address = os.getenv('LTC_ADDRESS', 'DEFAULT_LTC_ADDRESS')
-        if hasattr(bot, 'LTC_ADDRESS'):
-            self.ltc_address = bot.LTC_ADDRESS
-        self.colors = bot.COLORS if hasattr(bot, 'COLORS') else {
-            "success": 0x43B581,
-            "error": 0xF04747,
-            "info": 0x7289DA,
-            "warning": 0xFAA61A,
-            "shop": 0x36393F,
-            "primary": 0x5865F2
-        }
-        self.create_embed = bot.create_embed if hasattr(bot, 'create_embed') else self.default_embed
-
-    def default_embed(self, title, description, color=0x5865F2, timestamp=True):
-        """Fallback embed creation if bot.create_embed is not available"""
-        embed = discord.Embed(title=title, description=description, color=color)
-        if timestamp:
-            embed.timestamp = datetime.now()
-        return embed
-
-    @commands.Cog.listener()
-    async def on_command(self, ctx):
-        if ctx.command.cog_name == self.__class__.__name__:
-            if await self.is_banned(ctx.author.id):
-                await ctx.send(
-                    embed=self.create_embed(
-                        "🚫 Access Denied",
-                        "You are banned from using this shop.",
-                        self.colors["error"]
-                    )
-                )
-                raise commands.CheckFailure("User is banned")
-
-    async def is_banned(self, user_id):
-        """Check if a user is banned from using the shop"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute(
-                "SELECT 1 FROM banned_users WHERE user_id = ?", (user_id,)
-            ) as cursor:
-                return await cursor.fetchone() is not None
-
-    @commands.command(name="shop")
-    async def shop(self, ctx):
-        """View all available items with prices, stock, and descriptions"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM items WHERE stock > 0") as cursor:
-                items = await cursor.fetchall()
-        
-        if not items:
-            await ctx.send(
-                embed=self.create_embed(
-                    "🛍️ Shop",
-                    "The shop is currently empty. Check back later for new products!",
-                    self.colors["shop"]
-                )
-            )
-            return
-        
-        embed = self.create_embed(
-            "🛍️ Shop Items",
-            "Browse our collection of premium products:",
-            self.colors["shop"]
-        )
-        
-        # Add a thumbnail image
-        embed.set_thumbnail(url="https://i.imgur.com/xBuZqM1.png")
-        
-        for item in items:
-            embed.add_field(
-                name=f"🔹 {item['name']} - ${item['price']:.2f}",
-                value=f"**Stock:** {item['stock']} remaining\\n**Description:** {item['description']}",
-                inline=False
-            )
-        
-        embed.set_footer(text="To purchase an item, use s!buy <item name>")
-        await ctx.send(embed=embed)
-
-    @commands.command(name="userhelp")
-    async def user_help(self, ctx):
-        """Shop Bot help command"""
-        embed = self.create_embed(
-            "Shop Bot Help",
-            "Here are all the commands you can use:",
-            self.colors["info"]
-        )
-        
-        # Add a nice thumbnail
-        embed.set_thumbnail(url="https://i.imgur.com/q5nyBD4.png")
-        
-        # User commands
-        embed.add_field(
-            name="💰 Shop Commands",
-            value=(
-                "`s!shop` - Browse available items\\n"
-                "`s!buy <item>` - Purchase an item\\n"
-                "`s!confirm <key>` - Confirm your payment\\n"
-                "`s!price <item>` - Check item price\\n"
-                "`s!stock <item>` - Check item stock\\n"
-                "`s!orders` - View your orders\\n"
-                "`s!cancelorder <order_id>` - Cancel pending order\\n"
-                "`s!refund <order_id>` - Request a refund"
-            ),
-            inline=False
-        )
-        
-        await ctx.send(embed=embed)
-
-async def setup(bot):
-    await bot.add_cog(UserCommands(bot))
-""")
+        shutil.copyfile(os.path.join(_TEMPLATES_DIR, 'user_commands.py.tmpl'), user_commands_path)
 
     if not os.path.exists(admin_commands_path):
         logger.info("Creating a minimal admin_commands.py")
-        with open(admin_commands_path, 'w') as f:
-            f.write("""import discord
-from discord.ext import commands
-import aiosqlite
-from datetime import datetime
-import logging
-import os
+        shutil.copyfile(os.path.join(_TEMPLATES_DIR, 'admin_commands.py.tmpl'), admin_commands_path)
 
-logger = logging.getLogger("shop_bot.admin_commands")
-
-class AdminCommands(commands.Cog):
-    def __init__(self, bot):
-        self.bot = bot
-        self.db_path = "shop_database.db"
-        self.colors = bot.COLORS if hasattr(bot, 'COLORS') else {
-            "success": 0x43B581,
-            "error": 0xF04747,
-            "info": 0x7289DA,
-            "warning": 0xFAA61A,
-            "shop": 0x36393F,
-            "admin": 0xE91E63,
-            "primary": 0x5865F2
-        }
-        self.create_embed = bot.create_embed if hasattr(bot, 'create_embed') else self.default_embed
-        
-    def default_embed(self, title, description, color=0x5865F2, timestamp=True):
-        """Fallback embed creation if bot.create_embed is not available"""
-        embed = discord.Embed(title=title, description=description, color=color)
-        if timestamp:
-            embed.timestamp = datetime.now()
-        return embed
-        
-    def safe_get_field(self, row, field, default=None):
-        """Safely get a field from a sqlite3.Row object"""
-        try:
-            if field in row.keys():
-                return row[field]
-            return default
-        except:
-            return default
-        
-    def cog_check(self, ctx):
-        """Check if the user has admin privileges"""
-        if not ctx.guild:
-            return False
-        admin_role_id = int(os.getenv('ADMIN_ROLE_ID', 0))
-        admin_role = discord.utils.get(ctx.guild.roles, id=admin_role_id)
-        if admin_role and admin_role in ctx.author.roles:
-            return True
-        return ctx.author.guild_permissions.administrator
-
-    @commands.command(name="vieworders")
-    async def view_orders(self, ctx, limit: int = 10):
-        """View recent orders as an admin"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                """
-                SELECT o.id, o.user_id, i.name, o.quantity, o.total_price, o.status, o.created_at
-                FROM orders o
-                JOIN items i ON o.item_id = i.id
-                ORDER BY o.created_at DESC
-                LIMIT ?
-                """,
-                (limit,)
-            ) as cursor:
-                orders = await cursor.fetchall()
-        
-        if not orders:
-            await ctx.send(
-                embed=self.create_embed(
-                    "📋 Orders",
-                    "No orders found in the database.",
-                    self.colors["info"]
-                )
-            )
-            return
-        
-        embed = self.create_embed(
-            "📋 Orders",
-            f"Showing last {len(orders)} orders:",
-            self.colors["admin"]
-        )
-        
-        for order in orders:
-            status_emoji = {
-                "pending": "⏳",
-                "paid": "💰",
-                "delivered": "✅",
-                "cancelled": "❌"
-            }.get(order['status'].lower(), "❓")
-            
-            # Try to get user name
-            user = self.bot.get_user(order['user_id'])
-            user_display = user.mention if user else f"ID: {order['user_id']}"
-            
-            embed.add_field(
-                name=f"Order #{order['id']} - {status_emoji} {order['status'].capitalize()}",
-                value=f"**User:** {user_display}\\n"
-                      f"**Item:** {order['name']}\\n"
-                      f"**Amount:** ${order['total_price']:.2f}\\n"
-                      f"**Date:** {order['created_at']}",
-                inline=False
-            )
-        
-        await ctx.send(embed=embed)
-
-async def setup(bot):
-    await bot.add_cog(AdminCommands(bot))
-""")
+def scan_directory(directory):
+    """List a directory once so the checks below can share the entries"""
+    with os.scandir(directory) as it:
+        return list(it)
 
 def main():
     logger.info("Starting permissions and file check...")
@@ -418,20 +288,29 @@ def main():
     # Ensure cogs directory exists
     cogs_dir = ensure_cogs_directory()
     
+    # Copy existing cogs
+    copy_existing_cogs()
+    
+    # List the cogs directory once, after the known cogs are in place
+    entries = scan_directory(cogs_dir)
+    
     # Create __init__.py 
-    ensure_python_files(cogs_dir)
+    if ensure_python_files(cogs_dir, entries):
+        # Files were renamed, so list the directory again
+        entries = scan_directory(cogs_dir)
     
     # Fix permissions
     fix_permissions(cogs_dir)
     
-    # Copy existing cogs
-    copy_existing_cogs()
-    
     # Verify cog files
-    verify_cog_files(cogs_dir)
+    verify_cog_files(cogs_dir, entries)
     
     # Create a sample cog if none exist
-    create_sample_cog(cogs_dir)
+    create_sample_cog(cogs_dir, entries)
+    
+    # Precompile the cogs so the bot does not have to on its first start
+    if not compileall.compile_dir(cogs_dir, quiet=1, workers=0):
+        logger.warning("Some cog files in %s failed to compile", cogs_dir)
     
     logger.info("Permissions and file check completed")
     